@@ -1,7 +1,157 @@
 import requests
+import io
 import json
-from datetime import datetime, timedelta
-from lxml import html
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import partial
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Maximum number of requests in flight against bna.com.ar
+MAX_CONCURRENT_REQUESTS = 32
+# Retries per date before falling back to the last known value
+MAX_RETRIES = 3
+# Base delay in seconds for the exponential backoff between retries
+BACKOFF_FACTOR = 0.5
+# Raw BNA pages already downloaded, one file per date, so re-runs skip the network
+CACHE_DIR = './data/cache'
+
+# Shared session so every request reuses pooled keep-alive connections
+# instead of doing a fresh TCP + TLS handshake per date
+session = requests.Session()
+session.headers.update({"User-Agent": "grain-price-analyzer"})
+session.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_CONCURRENT_REQUESTS,
+    max_retries=Retry(total=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, status_forcelist=[500, 502, 503, 504]),
+))
+
+# Row query is compiled once and reused for every page
+ROWS_XPATH = etree.XPath('./tbody/tr')
+# BNA always renders quote dates as DD/MM/YYYY
+DATE_CELL_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+
+
+def get_cache_path(current_date):
+    """Path of the cached BNA page for a date."""
+    return os.path.join(CACHE_DIR, f"{current_date.strftime('%Y-%m-%d')}.html")
+
+
+def fetch_page(current_date):
+    """Fetch the BNA quotes page for a date, reading it from the on-disk cache when present."""
+    cache_path = get_cache_path(current_date)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            return f.read()
+
+    date_str_url = current_date.strftime('%d/%m/%Y')
+    url = f'https://www.bna.com.ar/Cotizador/HistoricoPrincipales?id=billetes&fecha={date_str_url}&filtroEuro=0&filtroDolar=1'
+    resp = session.get(url, timeout=10)
+    resp.raise_for_status()
+    return resp.content
+
+
+def cache_page(current_date, content):
+    """
+    Store a page that is known to contain quotes in the on-disk cache.
+
+    Quotes for today may still change, so only past days are cached. Failing
+    to write the cache is not an error, the page is simply fetched again on
+    the next run.
+    """
+    cache_path = get_cache_path(current_date)
+    if current_date.date() >= datetime.now().date() or os.path.exists(cache_path):
+        return
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def find_quote_rows(content):
+    """
+    Return the data rows of the table inside <div id="tablaDolar">.
+
+    The page is parsed incrementally and parsing stops as soon as that table
+    is complete; tables outside it are discarded as soon as they have been read.
+    """
+    tables = etree.iterparse(io.BytesIO(content), events=('end',), tag='table',
+                             html=True, encoding='utf-8', recover=True)
+    for _, table in tables:
+        parent = table.getparent()
+        if parent is not None and parent.tag == 'div' and parent.get('id') == 'tablaDolar':
+            # Skip the header row, which is the first row of the whole table
+            return ROWS_XPATH(table)[1:]
+        # Tables nested inside the quotes table are part of its cells, keep them
+        if any(div.get('id') == 'tablaDolar' for div in table.iterancestors('div')):
+            continue
+        table.clear()
+        while table.getprevious() is not None:
+            del parent[0]
+    return []
+
+
+def parse_quotes(rows, fallback_date):
+    """Extract (date, value) pairs from the rows of the BNA quotes table."""
+    quotes = []
+    # Bound once, the loop runs for every row of every page
+    append = quotes.append
+    match_date = DATE_CELL_RE.fullmatch
+    for row in rows:
+        cells = row.findall('td')
+        if len(cells) < 4:
+            continue
+        value_raw = ''.join(cells[2].itertext()).strip().replace(',', '.')
+        try:
+            value = float(value_raw)
+            formatted_value = f"{value:.1f}"
+        except Exception:
+            continue
+        date_cell = ''.join(cells[3].itertext()).strip()
+        # Format date as YYYY-MM-DD
+        date_match = match_date(date_cell)
+        if date_match is None:
+            date_str = fallback_date
+        else:
+            day, month, year = date_match.groups()
+            try:
+                date_str = date(int(year), int(month), int(day)).isoformat()
+            except ValueError:
+                date_str = fallback_date
+        append((date_str, formatted_value))
+    return quotes
+
+
+def fetch_one(current_date, last_value):
+    """
+    Fetch and parse the quotes for a date, as rows for the output file.
+
+    Falls back to the last known value when the page cannot be fetched or
+    has no quotes table. Runs on the worker threads, so it only touches
+    its own data.
+    """
+    date_str_out = current_date.strftime('%Y-%m-%d')
+    try:
+        content = fetch_page(current_date)
+        rows = find_quote_rows(content)
+        if rows:
+            quotes = [{"date": date_str, "value": formatted_value}
+                      for date_str, formatted_value in parse_quotes(rows, date_str_out)]
+            # Only pages with a quotes table are cached, so maintenance or
+            # empty pages are fetched again on the next run
+            cache_page(current_date, content)
+            return quotes
+    except Exception:
+        pass
+    # fallback: write last known value
+    return [{"date": date_str_out, "value": last_value}]
+
 
 # Read the json file ./data/dolar_exchange.json
 with open('./data/dolar_exchange.json', 'r') as f:
@@ -9,7 +159,7 @@ with open('./data/dolar_exchange.json', 'r') as f:
 
 # Fetch the last record of .data
 last_record = data['data'][-1]
-last_date = datetime.strptime(last_record[0], '%Y-%m-%d')
+last_date = datetime.fromisoformat(last_record[0])
 last_value = last_record[1]
 
 # Set the date range
@@ -21,60 +171,22 @@ output_file = './data/dolar_exchange_complete.json'
 seen_dates = set()
 rows_to_write = []
 
-for i in range((end_date - init_date).days + 1):
-    print(f"Processing date {i+1} of {(end_date - init_date).days + 1}")
-    current_date = init_date + timedelta(days=i)
-    date_str_url = current_date.strftime('%d/%m/%Y')
-    date_str_out = current_date.strftime('%Y-%m-%d')
-    url = f'https://www.bna.com.ar/Cotizador/HistoricoPrincipales?id=billetes&fecha={date_str_url}&filtroEuro=0&filtroDolar=1'
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        content = resp.text
-        # Skip all until <div id="cotizacionesCercanas">
-        idx = content.find('<div id="cotizacionesCercanas">')
-        if idx == -1:
-            # fallback: write last known value
-            if date_str_out not in seen_dates:
-                rows_to_write.append({"date": date_str_out, "value": last_value})
-                seen_dates.add(date_str_out)
-            continue
-        content = content[idx:]
-        print(f"Fetched data for {date_str_url}: \n {content}")
-        # Parse the HTML
-        tree = html.fromstring(content)
-        rows = tree.xpath('//div[@id="tablaDolar"]/table/tbody/tr')
-        if not rows:
-            # fallback: write last known value
-            if date_str_out not in seen_dates:
-                rows_to_write.append({"date": date_str_out, "value": last_value})
-                seen_dates.add(date_str_out)
-            continue
-        for row in rows[1:]:  # skip header
-            cells = row.xpath('./td')
-            if len(cells) < 4:
-                continue
-            value_raw = cells[2].text_content().strip().replace(',', '.')
-            try:
-                value = float(value_raw)
-                formatted_value = f"{value:.1f}"
-            except Exception:
-                continue
-            date_cell = cells[3].text_content().strip()
-            # Format date as YYYY-MM-DD
-            try:
-                date_obj = datetime.strptime(date_cell, '%d/%m/%Y')
-                date_str = date_obj.strftime('%Y-%m-%d')
-            except Exception:
-                date_str = date_str_out
-            if date_str not in seen_dates:
-                rows_to_write.append({"date": date_str, "value": formatted_value})
-                seen_dates.add(date_str)
-    except Exception:
-        # fallback: write last known value
-        if date_str_out not in seen_dates:
-            rows_to_write.append({"date": date_str_out, "value": last_value})
-            seen_dates.add(date_str_out)
+# Fetch and parse all dates concurrently; results are consumed in date order
+# on this thread, so the first-seen-wins semantics of seen_dates are the same
+# as a sequential run and no locking is needed
+total_days = (end_date - init_date).days + 1
+dates = [init_date + timedelta(days=i) for i in range(total_days)]
+os.makedirs(CACHE_DIR, exist_ok=True)
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+    results = executor.map(partial(fetch_one, last_value=last_value), dates)
+    for i, rows in enumerate(results):
+        print(f"Processing date {i+1} of {total_days}")
+        for row in rows:
+            if row["date"] not in seen_dates:
+                rows_to_write.append(row)
+                seen_dates.add(row["date"])
+
+session.close()
 
 # Load existing data from dolar_exchange.json into rows_to_write
 print(f"Loading existing data from ./data/dolar_exchange.json")
@@ -103,5 +215,7 @@ for row in rows_to_write:
 # Sort the list by date before writing
 json_rows.sort(key=lambda x: x[0])
 
+# json.dumps encodes in one shot with the C encoder, json.dump streams
+# small chunks through the pure Python one
 with open(output_file, 'w') as f:
-    json.dump({"data": json_rows}, f, ensure_ascii=False)
+    f.write(json.dumps({"data": json_rows}, ensure_ascii=False))
@@ -6,11 +6,15 @@ Displays warnings for discarded rows.
 """
 
 import csv
+import os
 import sys
-from typing import List, Dict, Any
+from collections import deque
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 
 # Percentage threshold for outlier detection
 OUTLIER_THRESHOLD_PERCENTAGE = 50.0
+# Number of following rows checked to tell a sustained change from an isolated outlier
+LOOKAHEAD_ROWS = 2
 
 
 def is_numeric_column(column_name: str) -> bool:
@@ -19,6 +23,14 @@ def is_numeric_column(column_name: str) -> bool:
     return column_name != 'fecha'
 
 
+def parse_float(value: Any) -> Optional[float]:
+    """Parse a cell as float, returning None for non-numeric values."""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
 def calculate_percentage_difference(current: float, previous: float) -> float:
     """Calculate the percentage difference between current and previous values."""
     if previous == 0:
@@ -26,105 +38,140 @@ def calculate_percentage_difference(current: float, previous: float) -> float:
     return abs((current - previous) / previous) * 100
 
 
+def iter_with_lookahead(items: Iterable[Any], size: int) -> Iterator[Tuple[Any, List[Any]]]:
+    """
+    Yield each item together with the (up to) `size` items that follow it.
+
+    Only `size + 1` items are buffered at a time.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(item)
+        if len(pending) > size:
+            yield pending.popleft(), list(pending)
+    # The last items only have the lookahead that is left
+    while pending:
+        yield pending.popleft(), list(pending)
+
+
+def find_isolated_change(previous_values: List[Optional[float]], current_values: List[Optional[float]],
+                         lookahead_values: List[List[Optional[float]]], numeric_columns: List[str]) -> Optional[str]:
+    """
+    Describe the first column whose change from the previous row exceeds the threshold
+    and is not sustained in the lookahead rows. None means the row is kept.
+
+    Stops at the first such column, since one is enough to discard the row.
+    """
+    for col_index, col in enumerate(numeric_columns):
+        current_value = current_values[col_index]
+        previous_value = previous_values[col_index]
+
+        # Skip non-numeric values
+        if current_value is None or previous_value is None:
+            continue
+
+        diff_percentage = calculate_percentage_difference(current_value, previous_value)
+
+        if diff_percentage > OUTLIER_THRESHOLD_PERCENTAGE:
+            # Check if this change is sustained in the next 2 rows
+            is_sustained_change = False
+
+            # Look ahead at next rows (if they exist)
+            for next_values in lookahead_values:
+                next_value = next_values[col_index]
+                if next_value is None:
+                    continue
+
+                # Check if the trend continues in the same direction
+                # If current > previous and next is also > previous (or close to current)
+                # then it's likely a real trend change, not an outlier
+
+                # Calculate if next value is closer to current than to previous
+                diff_current_to_next = abs(current_value - next_value)
+                diff_previous_to_next = abs(previous_value - next_value)
+
+                # If next value is closer to current value than to previous,
+                # it suggests the change is sustained
+                if diff_current_to_next <= diff_previous_to_next:
+                    is_sustained_change = True
+                    break
+
+            # Only mark as outlier if the change is NOT sustained
+            if not is_sustained_change:
+                return f"{col}: {previous_value} -> {current_value} ({diff_percentage:.1f}% change, isolated)"
+
+    return None
+
+
 def sanitize_csv(input_file: str, output_file: str) -> None:
     """
     Sanitize CSV by removing rows with values that differ by more than the threshold from previous row,
     but only if the change is not sustained in the following 2 rows (indicating an isolated outlier).
 
+    Rows are streamed with a small lookahead window, so memory use does not grow with the file.
+
     Args:
         input_file: Path to input CSV file
         output_file: Path to output CSV file
     """
     discarded_count = 0
+    kept_rows = 0
     total_rows = 0
 
-    # First pass: read all rows into memory for lookahead analysis
-    with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-        reader = csv.DictReader(infile)
-        fieldnames = reader.fieldnames
-        all_rows = list(reader)
-
-    # Get numeric columns
-    numeric_columns = [col for col in fieldnames if is_numeric_column(col)]
-
-    rows_to_keep = []
-
-    for i, row in enumerate(all_rows):
-        total_rows += 1
-        row_num = i + 2  # Adjust for header row
-
-        # Always keep the first data row
-        if i == 0:
-            rows_to_keep.append(row)
-            continue
-
-        previous_row = all_rows[i - 1]
-
-        # Check for outliers in numeric columns
-        is_outlier = False
-        outlier_details = []
-
-        for col in numeric_columns:
-            try:
-                current_value = float(row[col])
-                previous_value = float(previous_row[col])
-
-                diff_percentage = calculate_percentage_difference(current_value, previous_value)
-
-                if diff_percentage > OUTLIER_THRESHOLD_PERCENTAGE:
-                    # Check if this change is sustained in the next 2 rows
-                    is_sustained_change = False
-
-                    # Look ahead at next 2 rows (if they exist)
-                    for j in range(1, 3):  # Check next 1-2 rows
-                        if i + j < len(all_rows):
-                            try:
-                                next_value = float(all_rows[i + j][col])
-
-                                # Check if the trend continues in the same direction
-                                # If current > previous and next is also > previous (or close to current)
-                                # then it's likely a real trend change, not an outlier
-
-                                # Calculate if next value is closer to current than to previous
-                                diff_current_to_next = abs(current_value - next_value)
-                                diff_previous_to_next = abs(previous_value - next_value)
-
-                                # If next value is closer to current value than to previous,
-                                # it suggests the change is sustained
-                                if diff_current_to_next <= diff_previous_to_next:
-                                    is_sustained_change = True
-                                    break
-
-                            except (ValueError, TypeError):
-                                continue
-
-                    # Only mark as outlier if the change is NOT sustained
-                    if not is_sustained_change:
-                        is_outlier = True
-                        outlier_details.append(f"{col}: {previous_value} -> {current_value} ({diff_percentage:.1f}% change, isolated)")
-
-            except (ValueError, TypeError):
-                # Skip non-numeric values
-                continue
-
-        if is_outlier:
-            discarded_count += 1
-            print(f"WARNING: Discarding row {row_num} - {row['fecha']} (isolated outlier)")
-            for detail in outlier_details:
-                print(f"  {detail}")
-            print(f"  Full row: {dict(row)}")
-            print()
-        else:
-            rows_to_keep.append(row)
-
-    # Write sanitized data to output file
-    with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows_to_keep)
+    # Stream into a temporary file next to the output and only replace the output
+    # once every row has been processed, so a failure never leaves it truncated
+    tmp_file = f"{output_file}.tmp"
+    try:
+        with open(input_file, 'r', newline='', encoding='utf-8') as infile, \
+                open(tmp_file, 'w', newline='', encoding='utf-8') as outfile:
+            reader = csv.reader(infile)
+            writer = csv.writer(outfile)
+
+            header = next(reader)
+            writer.writerow(header)
+
+            # Resolve column positions once from the header
+            date_index = header.index('fecha')
+            numeric_columns = [col for col in header if is_numeric_column(col)]
+            numeric_indexes = [header.index(col) for col in numeric_columns]
+
+            # Parse every numeric cell once, so comparisons and lookahead work on floats.
+            # Like csv.DictReader, blank lines are skipped and cells missing from
+            # short rows count as non-numeric
+            parsed_rows = (
+                (row, [parse_float(row[index]) if index < len(row) else None for index in numeric_indexes])
+                for row in reader if row
+            )
+
+            previous_values = None
+            for (row, current_values), lookahead in iter_with_lookahead(parsed_rows, LOOKAHEAD_ROWS):
+                total_rows += 1
+                row_num = total_rows + 1  # Adjust for header row
+
+                # Always keep the first data row
+                outlier_detail = None
+                if previous_values is not None:
+                    lookahead_values = [values for _, values in lookahead]
+                    outlier_detail = find_isolated_change(previous_values, current_values, lookahead_values, numeric_columns)
+                # Compare the next row against this one whether it is kept or not
+                previous_values = current_values
+
+                if outlier_detail is not None:
+                    discarded_count += 1
+                    print(f"WARNING: Discarding row {row_num} - {row[date_index]} (isolated outlier)")
+                    print(f"  {outlier_detail}")
+                    print(f"  Full row: {dict(zip(header, row + [None] * (len(header) - len(row))))}")
+                    print()
+                else:
+                    # Pad short rows with empty cells, as csv.DictWriter did
+                    writer.writerow(row + [''] * (len(header) - len(row)))
+                    kept_rows += 1
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
     # Summary
-    kept_rows = len(rows_to_keep)
     print(f"Sanitization complete:")
     print(f"  Total rows processed: {total_rows}")
     print(f"  Rows kept: {kept_rows}")
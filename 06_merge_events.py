@@ -44,13 +44,19 @@ def merge_events():
     # Get current year
     current_year = datetime.now().year
     
+    # Split and pad each DD-MM key once instead of once per year
+    parsed_regular_events = []
+    for date_key, event_description in regular_events.items():
+        separator = date_key.index('-')
+        day, month = date_key[:separator], date_key[separator + 1:]
+        parsed_regular_events.append((month.zfill(2), day.zfill(2), event_description))
+    
     # Duplicate regular events for each year from 2018 to current year
-    for year in range(2018, current_year + 1):
-        for date_key, event_description in regular_events.items():
-            # Convert DD-MM format to YYYY-MM-DD format
-            day, month = date_key.split('-')
-            full_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            all_events[full_date] = event_description
+    all_events.update({
+        f"{year}-{month}-{day}": event_description
+        for year in range(2018, current_year + 1)
+        for month, day, event_description in parsed_regular_events
+    })
     
     # Ensure data directory exists
     os.makedirs("data", exist_ok=True)
@@ -58,7 +64,7 @@ def merge_events():
     # Write merged events to output file
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(all_events, f, indent=2, ensure_ascii=False)
+            f.write(json.dumps(all_events, indent=2, ensure_ascii=False))
         print(f"Successfully created {output_path}")
         print(f"Total events: {len(all_events)}")
         print(f"Regular events duplicated for years 2018-{current_year}")